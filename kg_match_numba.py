@@ -0,0 +1,246 @@
+"""
+kg_match_numba.py
+─────────────────
+Native substring matching for the knowledge-graph scorer.
+
+Labels are packed into one contiguous uint8 buffer (UTF-8) with an offsets
+array, and a Numba-compiled Boyer–Moore–Horspool search fills a boolean
+matrix where  hits[i, j] = left[i] in right[j]  or  right[j] in left[i].
+UTF-8 is self-synchronising, so a byte-level match is exactly a str match.
+
+score_candidates_csr scores every candidate in parallel (prange) from CSR
+adjacency arrays of integer node ids and returns encoded signals that the
+caller decodes back into label strings; callers go through score_candidates,
+which caps the kernel at KG_THREADS threads.
+
+If numba is not installed the same matrix is produced in pure Python and
+knowledge_graph.py scores candidates with its Python loop instead.
+"""
+
+import os
+import threading
+from typing import List, Tuple
+
+import numpy as np
+
+try:
+    from numba import config as _numba_config, njit, prange, set_num_threads, threading_layer
+    _NUMBA_AVAILABLE = True
+    # Kernels are launched from asyncio.to_thread workers. Prefer OpenMP (thread-
+    # safe) over TBB, whose pool can hang interpreter exit when first used off
+    # the main thread; NUMBA_THREADING_LAYER still overrides this.
+    _numba_config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+except ImportError:  # optional — pure-Python fallback below
+    _NUMBA_AVAILABLE = False
+
+
+# Threads per kernel launch. Stage 1 runs alongside the embedding encoder
+# (TORCH_THREADS), so each takes half the usable cores by default; set it
+# explicitly under a CPU quota, which affinity does not reflect.
+_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+KG_THREADS = int(os.getenv("KG_THREADS", max(1, _CPUS // 2)))
+
+# Signal kinds emitted by score_candidates_csr
+SIG_SKILL = 0      # a = shared skill node id
+SIG_TITLE = 1      # a = exactly matched title node id
+SIG_PARTIAL = 2    # a = user title row, b = candidate title node id
+SIG_GOAL = 3       # a = goal row
+
+
+def pack_labels(labels: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (uint8 buffer, int64 offsets) with label i at buf[off[i]:off[i+1]]."""
+    encoded = [lab.encode("utf-8") for lab in labels]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return buf, offsets
+
+
+if _NUMBA_AVAILABLE:
+
+    @njit(cache=True)
+    def _fill_skip(skip, needle, n0, n1):
+        """Horspool bad-character shifts for needle[n0:n1], written into skip."""
+        m = n1 - n0
+        skip[:] = m
+        for k in range(m - 1):
+            skip[needle[n0 + k]] = m - 1 - k
+
+    @njit(cache=True)
+    def _contains(hay, h0, h1, needle, n0, n1, skip):
+        """Boyer–Moore–Horspool: is needle[n0:n1] a substring of hay[h0:h1]?"""
+        m = n1 - n0
+        n = h1 - h0
+        if m == 0:
+            return True
+        if m > n:
+            return False
+        i = 0
+        while i <= n - m:
+            j = m - 1
+            while j >= 0 and hay[h0 + i + j] == needle[n0 + j]:
+                j -= 1
+            if j < 0:
+                return True
+            i += skip[hay[h0 + i + m - 1]]
+        return False
+
+    @njit(cache=True)
+    def _match_matrix(l_buf, l_off, r_buf, r_off):
+        # Each label's skip table is built once, as the needle of one pass
+        n_left = l_off.shape[0] - 1
+        n_right = r_off.shape[0] - 1
+        hits = np.zeros((n_left, n_right), dtype=np.bool_)
+        skip = np.empty(256, dtype=np.int64)
+        for i in range(n_left):
+            a0, a1 = l_off[i], l_off[i + 1]
+            _fill_skip(skip, l_buf, a0, a1)
+            for j in range(n_right):
+                hits[i, j] = _contains(r_buf, r_off[j], r_off[j + 1], l_buf, a0, a1, skip)
+        for j in range(n_right):
+            b0, b1 = r_off[j], r_off[j + 1]
+            _fill_skip(skip, r_buf, b0, b1)
+            for i in range(n_left):
+                if not hits[i, j]:
+                    hits[i, j] = _contains(l_buf, l_off[i], l_off[i + 1], r_buf, b0, b1, skip)
+        return hits
+
+    @njit(parallel=True, cache=True)
+    def score_candidates_csr(
+        skill_ptr, skill_ids, title_ptr, title_ids,
+        user_skill_ids, user_title_ids, title_hits, goal_hits, max_signals,
+    ):
+        """
+        Score candidate i from its sorted skill ids skill_ids[skill_ptr[i]:skill_ptr[i+1]]
+        and sorted title ids title_ids[title_ptr[i]:title_ptr[i+1]].
+
+        user_skill_ids must be sorted; user_title_ids is in title_hits row order.
+        Returns (scores, n_signals, sig_kind, sig_a, sig_b); same point weights
+        and cap as knowledge_graph.score_candidate.
+        """
+        n = skill_ptr.shape[0] - 1
+        n_user_titles = user_title_ids.shape[0]
+        n_goals = goal_hits.shape[0]
+        scores = np.zeros(n, dtype=np.float32)
+        n_signals = np.zeros(n, dtype=np.int32)
+        sig_kind = np.zeros((n, max_signals), dtype=np.int8)
+        sig_a = np.zeros((n, max_signals), dtype=np.int32)
+        sig_b = np.zeros((n, max_signals), dtype=np.int32)
+
+        for i in prange(n):
+            cs = skill_ids[skill_ptr[i]:skill_ptr[i + 1]]
+            ct = title_ids[title_ptr[i]:title_ptr[i + 1]]
+            score = 0.0
+            k = 0
+
+            # Shared skills: merge-walk two sorted id arrays
+            a = 0
+            b = 0
+            while a < user_skill_ids.shape[0] and b < cs.shape[0]:
+                if user_skill_ids[a] == cs[b]:
+                    sig_kind[i, k] = SIG_SKILL
+                    sig_a[i, k] = cs[b]
+                    k += 1
+                    score += 15
+                    a += 1
+                    b += 1
+                elif user_skill_ids[a] < cs[b]:
+                    a += 1
+                else:
+                    b += 1
+
+            # Exact title match
+            matched = np.zeros(n_user_titles, dtype=np.bool_)
+            for r in range(n_user_titles):
+                p = np.searchsorted(ct, user_title_ids[r])
+                if p < ct.shape[0] and ct[p] == user_title_ids[r]:
+                    matched[r] = True
+                    sig_kind[i, k] = SIG_TITLE
+                    sig_a[i, k] = ct[p]
+                    k += 1
+                    score += 20
+
+            # Partial title match (first hit per unmatched user title)
+            for r in range(n_user_titles):
+                if matched[r]:
+                    continue
+                for q in range(ct.shape[0]):
+                    if title_hits[r, ct[q]]:
+                        sig_kind[i, k] = SIG_PARTIAL
+                        sig_a[i, k] = r
+                        sig_b[i, k] = ct[q]
+                        k += 1
+                        score += 10
+                        break
+
+            # Goal signals against candidate skills / titles
+            for g in range(n_goals):
+                hit = False
+                for q in range(cs.shape[0]):
+                    if goal_hits[g, cs[q]]:
+                        hit = True
+                        break
+                if not hit:
+                    for q in range(ct.shape[0]):
+                        if goal_hits[g, ct[q]]:
+                            hit = True
+                            break
+                if hit:
+                    sig_kind[i, k] = SIG_GOAL
+                    sig_a[i, k] = g
+                    k += 1
+                    score += 10
+
+            scores[i] = min(score, 100.0)
+            n_signals[i] = k
+
+        return scores, n_signals, sig_kind, sig_a, sig_b
+
+
+# The workqueue layer (used when neither OpenMP nor TBB can load) aborts the
+# process on concurrent launches, so kernels are serialised until the first
+# launch shows that a thread-safe layer was picked.
+_launch_lock = threading.Lock()
+_layer_threadsafe = False
+
+
+def score_candidates(*args):
+    """
+    Run score_candidates_csr on at most KG_THREADS threads.
+    set_num_threads is thread-local, so it is applied on every call from
+    whichever worker thread launches the kernel.
+    """
+    global _layer_threadsafe
+    n_threads = max(1, min(KG_THREADS, _numba_config.NUMBA_NUM_THREADS))
+    if _layer_threadsafe:
+        set_num_threads(n_threads)
+        return score_candidates_csr(*args)
+    with _launch_lock:
+        set_num_threads(n_threads)
+        result = score_candidates_csr(*args)
+        _layer_threadsafe = threading_layer() != "workqueue"
+        return result
+
+
+def substring_match_matrix(left: List[str], right: List[str]) -> np.ndarray:
+    """Boolean (len(left), len(right)) matrix of two-way substring containment."""
+    if not left or not right:
+        return np.zeros((len(left), len(right)), dtype=np.bool_)
+    if _NUMBA_AVAILABLE:
+        l_buf, l_off = pack_labels(left)
+        r_buf, r_off = pack_labels(right)
+        return _match_matrix(l_buf, l_off, r_buf, r_off)
+    hits = np.zeros((len(left), len(right)), dtype=np.bool_)
+    for i, a in enumerate(left):
+        for j, b in enumerate(right):
+            hits[i, j] = a in b or b in a
+    return hits
+
+
+def warm_up() -> None:
+    """Trigger JIT compilation (or load the on-disk cache) ahead of traffic."""
+    hits = substring_match_matrix(["warm", ""], ["warm-up", "up"])
+    if _NUMBA_AVAILABLE:
+        ptr = np.array([0, 1], dtype=np.int32)
+        ids = np.array([0], dtype=np.int32)
+        score_candidates(ptr, ids, ptr, ids, ids, ids, hits, hits, 4)
@@ -22,93 +22,165 @@ Edges (directed)
 Scoring: structural overlap between USER intent nodes and CANDIDATE nodes.
 """
 
-import re
-import networkx as nx
-from typing import Dict, List, Tuple
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
 
+import numpy as np
+
+import kg_match_numba
 from schemas import UserProfileInfo, UserObjective, NetworkProfile
 
 
+@dataclass(slots=True)
+class KG:
+    """
+    Lightweight directed property graph (plain dicts, no NetworkX).
+
+    out_rel   : {node_id: {neighbour_id: rel}}   outgoing typed edges
+    label     : {node_id: display label}
+    node_type : {node_id: USER | CANDIDATE | SKILL | TITLE | INDUSTRY | GOAL}
+    """
+    out_rel: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    label: Dict[str, str] = field(default_factory=dict)
+    node_type: Dict[str, str] = field(default_factory=dict)
+
+
+@lru_cache(maxsize=4096)
 def _normalise(text: str) -> str:
-    return re.sub(r"\s+", "_", text.strip().lower())
+    # str.split() splits on runs of the same whitespace set as re's \s+,
+    # so this equals re.sub(r"\s+", "_", text.strip().lower()) without regex
+    return "_".join(text.lower().split())
 
 
 def build_graph(
     user_profile: UserProfileInfo,
     user_objective: UserObjective,
     candidates: List[NetworkProfile],
-) -> nx.DiGraph:
-    G = nx.DiGraph()
+) -> KG:
+    G = KG()
+    out = G.out_rel
+    lab = G.label
+    typ = G.node_type
 
     # ── User node ──────────────────────────────────────────────────────────────
     user_id = f"user::{user_objective.person_id}"
-    G.add_node(user_id, node_type="USER", label=user_profile.current_role.title)
+    lab[user_id] = user_profile.current_role.title
+    typ[user_id] = "USER"
+    user_out = out.setdefault(user_id, {})
+
+    # Each block inserts its nodes / edges in bulk (dict.update + fromkeys);
+    # shared candidate-side nodes keep their first-seen label (setdefault).
 
     # User skills
-    for sk in user_profile.top_skills or []:
-        sk_node = f"skill::{_normalise(sk.skill)}"
-        G.add_node(sk_node, node_type="SKILL", label=sk.skill)
-        G.add_edge(user_id, sk_node, rel="HAS_SKILL")
+    skill_names = [sk.skill for sk in user_profile.top_skills or []]
+    sk_nodes = [f"skill::{_normalise(sk)}" for sk in skill_names]
+    lab.update(zip(sk_nodes, skill_names))
+    typ.update(dict.fromkeys(sk_nodes, "SKILL"))
+    user_out.update(dict.fromkeys(sk_nodes, "HAS_SKILL"))
 
     # Sought titles from target_profiles
-    for tp in user_objective.target_profiles:
-        for t in tp.titles:
-            t_node = f"title::{_normalise(t)}"
-            G.add_node(t_node, node_type="TITLE", label=t)
-            G.add_edge(user_id, t_node, rel="SEEKS_TITLE", why=tp.why or "")
+    titles = [t for tp in user_objective.target_profiles for t in tp.titles]
+    t_nodes = [f"title::{_normalise(t)}" for t in titles]
+    lab.update(zip(t_nodes, titles))
+    typ.update(dict.fromkeys(t_nodes, "TITLE"))
+    user_out.update(dict.fromkeys(t_nodes, "SEEKS_TITLE"))
 
     # Success signals as GOAL nodes
-    for sig in user_objective.success_signals or []:
-        g_node = f"goal::{_normalise(sig)}"
-        G.add_node(g_node, node_type="GOAL", label=sig)
-        G.add_edge(user_id, g_node, rel="HAS_GOAL")
+    goals = user_objective.success_signals or []
+    g_nodes = [f"goal::{_normalise(sig)}" for sig in goals]
+    lab.update(zip(g_nodes, goals))
+    typ.update(dict.fromkeys(g_nodes, "GOAL"))
+    user_out.update(dict.fromkeys(g_nodes, "HAS_GOAL"))
 
     # ── Candidate nodes ────────────────────────────────────────────────────────
+    setlabel = lab.setdefault
     for c in candidates:
         c_id = f"candidate::{c.profile_id}"
-        G.add_node(
-            c_id,
-            node_type="CANDIDATE",
-            label=c.name,
-            title=c.title,
-            company=c.company or "",
-            industry=c.industry or "",
-        )
+        lab[c_id] = c.name
+        typ[c_id] = "CANDIDATE"
+        c_out = out.setdefault(c_id, {})
 
         # Skills
-        for sk in c.skills or []:
-            sk_node = f"skill::{_normalise(sk)}"
-            if not G.has_node(sk_node):
-                G.add_node(sk_node, node_type="SKILL", label=sk)
-            G.add_edge(c_id, sk_node, rel="HAS_SKILL")
+        skills = c.skills or []
+        sk_nodes = [f"skill::{_normalise(sk)}" for sk in skills]
+        for sk_node, sk in zip(sk_nodes, skills):
+            setlabel(sk_node, sk)
+        typ.update(dict.fromkeys(sk_nodes, "SKILL"))
+        c_out.update(dict.fromkeys(sk_nodes, "HAS_SKILL"))
 
         # Title keywords (each word as a possible title match)
-        for word in c.title.split():
-            if len(word) > 3:
-                t_node = f"title::{_normalise(word)}"
-                if not G.has_node(t_node):
-                    G.add_node(t_node, node_type="TITLE", label=word)
-                G.add_edge(c_id, t_node, rel="HAS_TITLE")
+        words = [w for w in c.title.split() if len(w) > 3]
+        t_nodes = [f"title::{_normalise(w)}" for w in words]
+        for t_node, word in zip(t_nodes, words):
+            setlabel(t_node, word)
+        typ.update(dict.fromkeys(t_nodes, "TITLE"))
+        c_out.update(dict.fromkeys(t_nodes, "HAS_TITLE"))
 
         # Full title node
         full_t_node = f"title::{_normalise(c.title)}"
-        G.add_node(full_t_node, node_type="TITLE", label=c.title)
-        G.add_edge(c_id, full_t_node, rel="HAS_TITLE")
+        lab[full_t_node] = c.title
+        typ[full_t_node] = "TITLE"
+        c_out[full_t_node] = "HAS_TITLE"
 
         # Industry
         if c.industry:
             ind_node = f"industry::{_normalise(c.industry)}"
-            if not G.has_node(ind_node):
-                G.add_node(ind_node, node_type="INDUSTRY", label=c.industry)
-            G.add_edge(c_id, ind_node, rel="IN_INDUSTRY")
+            setlabel(ind_node, c.industry)
+            typ[ind_node] = "INDUSTRY"
+            c_out[ind_node] = "IN_INDUSTRY"
 
     return G
 
 
-def score_candidate_kg(
-    G: nx.DiGraph,
+@dataclass(slots=True)
+class UserCtx:
+    """User-side scoring inputs, computed once per request."""
+    skills: FrozenSet[str]
+    titles: FrozenSet[str]
+    title_labels: List[Tuple[str, str]]   # (title node, lowercase label)
+    goals: FrozenSet[str]
+    goal_labels: List[str]                # lowercase goal labels
+    node_col: Dict[str, int]              # candidate-side node → matrix column
+    title_hits: np.ndarray                # bool (len(title_labels), len(node_col))
+    goal_hits: np.ndarray                 # bool (len(goal_labels), len(node_col))
+
+
+def precompute_user(
+    G: KG,
     user_id: str,
-    candidate_id: str,
+    lower_label: Dict[str, str],
+) -> UserCtx:
+    user_neighbours = G.out_rel.get(user_id, {})
+    skills = frozenset(n for n, r in user_neighbours.items() if r == "HAS_SKILL")
+    titles = frozenset(n for n, r in user_neighbours.items() if r == "SEEKS_TITLE")
+    goals = frozenset(n for n, r in user_neighbours.items() if r == "HAS_GOAL")
+    title_labels = [(t, lower_label.get(t, "")) for t in titles]
+    goal_labels = [lower_label.get(g, "") for g in goals]
+
+    # Substring matching runs once per request over every distinct
+    # SKILL / TITLE node instead of once per (user node, candidate node) pair
+    cols = [n for n, t in G.node_type.items() if t in ("SKILL", "TITLE")]
+    col_labels = [lower_label.get(n, "") for n in cols]
+    return UserCtx(
+        skills=skills,
+        titles=titles,
+        title_labels=title_labels,
+        goals=goals,
+        goal_labels=goal_labels,
+        node_col={n: j for j, n in enumerate(cols)},
+        title_hits=kg_match_numba.substring_match_matrix(
+            [lab for _, lab in title_labels], col_labels
+        ),
+        goal_hits=kg_match_numba.substring_match_matrix(goal_labels, col_labels),
+    )
+
+
+def score_candidate(
+    ctx: UserCtx,
+    cand_adj: Dict[str, str],
+    labels: Dict[str, str],
+    lower_label: Dict[str, str],
 ) -> Tuple[float, List[str]]:
     """
     Returns (score 0-100, list of matched signal descriptions).
@@ -124,48 +196,41 @@ def score_candidate_kg(
     signals: List[str] = []
     score = 0.0
 
-    user_neighbours = {n: G[user_id][n]["rel"] for n in G.successors(user_id)}
-    cand_neighbours = {n: G[candidate_id][n]["rel"] for n in G.successors(candidate_id)}
-
     # Skill overlap
-    user_skills = {n for n, r in user_neighbours.items() if r == "HAS_SKILL"}
-    cand_skills = {n for n, r in cand_neighbours.items() if r == "HAS_SKILL"}
-    shared_skills = user_skills & cand_skills
-    for s in shared_skills:
-        label = G.nodes[s].get("label", s)
+    cand_skills = frozenset(n for n, r in cand_adj.items() if r == "HAS_SKILL")
+    for s in ctx.skills & cand_skills:
+        label = labels.get(s, s)
         signals.append(f"Shared skill: {label}")
         score += 15
 
     # Title match: user SEEKS_TITLE → candidate HAS_TITLE
-    user_titles = {n for n, r in user_neighbours.items() if r == "SEEKS_TITLE"}
-    cand_titles = {n for n, r in cand_neighbours.items() if r == "HAS_TITLE"}
-    matched_titles = user_titles & cand_titles
+    cand_titles = frozenset(n for n, r in cand_adj.items() if r == "HAS_TITLE")
+    matched_titles = set(ctx.titles & cand_titles)
     for t in matched_titles:
-        label = G.nodes[t].get("label", t)
+        label = labels.get(t, t)
         signals.append(f"Title match: {label}")
         score += 20
 
     # Partial title match (token-level)
-    for ut in user_titles:
-        ut_label = G.nodes[ut].get("label", "").lower()
-        for ct in cand_titles:
-            ct_label = G.nodes[ct].get("label", "").lower()
-            if ut not in matched_titles and (ut_label in ct_label or ct_label in ut_label):
-                signals.append(f"Partial title match: {ut_label} ↔ {ct_label}")
-                score += 10
-                matched_titles.add(ut)  # avoid double-count
+    col = ctx.node_col
+    cand_title_list = list(cand_titles)
+    title_hits = ctx.title_hits[:, [col[ct] for ct in cand_title_list]]
+    for i, (ut, ut_label) in enumerate(ctx.title_labels):
+        if ut in matched_titles:
+            continue
+        row = title_hits[i]
+        if row.any():
+            ct_label = lower_label.get(cand_title_list[int(row.argmax())], "")
+            signals.append(f"Partial title match: {ut_label} ↔ {ct_label}")
+            score += 10
+            matched_titles.add(ut)  # avoid double-count
 
     # Goal signals (keyword overlap in candidate skills / title)
-    user_goals = {n for n, r in user_neighbours.items() if r == "HAS_GOAL"}
-    cand_all_nodes = set(cand_skills) | set(cand_titles)
-    for g in user_goals:
-        g_label = G.nodes[g].get("label", "").lower()
-        for cn in cand_all_nodes:
-            cn_label = G.nodes[cn].get("label", "").lower()
-            if g_label in cn_label or cn_label in g_label:
-                signals.append(f"Goal signal match: {g_label}")
-                score += 10
-                break
+    goal_hit = ctx.goal_hits[:, [col[cn] for cn in cand_skills | cand_titles]].any(axis=1)
+    for g_label, hit in zip(ctx.goal_labels, goal_hit):
+        if hit:
+            signals.append(f"Goal signal match: {g_label}")
+            score += 10
 
     return min(score, 100.0), signals
 
@@ -178,9 +243,70 @@ def kg_filter_and_score(
     """Build graph and return {profile_id: (score, signals)} for all candidates."""
     G = build_graph(user_profile, user_objective, candidates)
     user_id = f"user::{user_objective.person_id}"
+    lower_label = {n: lab.lower() for n, lab in G.label.items()}
+    ctx = precompute_user(G, user_id, lower_label)
+    if kg_match_numba._NUMBA_AVAILABLE:
+        return _score_candidates_parallel(ctx, G, candidates, lower_label)
+    out = G.out_rel
     results: Dict[str, Tuple[float, List[str]]] = {}
     for c in candidates:
-        c_id = f"candidate::{c.profile_id}"
-        score, signals = score_candidate_kg(G, user_id, c_id)
-        results[c.profile_id] = (score, signals)
+        cand_adj = out.get(f"candidate::{c.profile_id}", {})
+        results[c.profile_id] = score_candidate(ctx, cand_adj, G.label, lower_label)
+    return results
+
+
+def _score_candidates_parallel(
+    ctx: UserCtx,
+    G: KG,
+    candidates: List[NetworkProfile],
+    lower_label: Dict[str, str],
+) -> Dict[str, Tuple[float, List[str]]]:
+    """
+    Numba path for kg_filter_and_score: pack candidate adjacency into CSR
+    arrays of column ids, score all candidates with prange, decode signals.
+    """
+    col = ctx.node_col
+    cols = list(col)
+    out = G.out_rel
+
+    skill_ptr = np.zeros(len(candidates) + 1, dtype=np.int32)
+    title_ptr = np.zeros(len(candidates) + 1, dtype=np.int32)
+    skill_ids: List[int] = []
+    title_ids: List[int] = []
+    for i, c in enumerate(candidates):
+        cand_adj = out.get(f"candidate::{c.profile_id}", {})
+        skill_ids.extend(sorted(col[n] for n, r in cand_adj.items() if r == "HAS_SKILL"))
+        title_ids.extend(sorted(col[n] for n, r in cand_adj.items() if r == "HAS_TITLE"))
+        skill_ptr[i + 1] = len(skill_ids)
+        title_ptr[i + 1] = len(title_ids)
+
+    user_title_nodes = [t for t, _ in ctx.title_labels]
+    scores, n_signals, sig_kind, sig_a, sig_b = kg_match_numba.score_candidates(
+        skill_ptr,
+        np.asarray(skill_ids, dtype=np.int32),
+        title_ptr,
+        np.asarray(title_ids, dtype=np.int32),
+        np.asarray(sorted(col[s] for s in ctx.skills), dtype=np.int32),
+        np.asarray([col[t] for t in user_title_nodes], dtype=np.int32),
+        ctx.title_hits,
+        ctx.goal_hits,
+        len(ctx.skills) + len(ctx.titles) + len(ctx.goals),
+    )
+
+    labels = G.label
+    results: Dict[str, Tuple[float, List[str]]] = {}
+    for i, c in enumerate(candidates):
+        signals: List[str] = []
+        for k in range(n_signals[i]):
+            kind, a = sig_kind[i, k], sig_a[i, k]
+            if kind == kg_match_numba.SIG_SKILL:
+                signals.append(f"Shared skill: {labels[cols[a]]}")
+            elif kind == kg_match_numba.SIG_TITLE:
+                signals.append(f"Title match: {labels[cols[a]]}")
+            elif kind == kg_match_numba.SIG_PARTIAL:
+                ct_label = lower_label.get(cols[sig_b[i, k]], "")
+                signals.append(f"Partial title match: {ctx.title_labels[a][1]} ↔ {ct_label}")
+            else:
+                signals.append(f"Goal signal match: {ctx.goal_labels[a]}")
+        results[c.profile_id] = (float(scores[i]), signals)
     return results
@@ -2,7 +2,9 @@
 llm_reasoner.py
 ───────────────
 Calls Mistral-7B to generate a one-sentence natural-language reason
-for each candidate match.
+for each candidate match. Candidates are sent in batches: one prompt
+carries the user context once plus a numbered candidate list, and the
+model answers with a JSON object of reasons keyed by number.
 
 Strategy (in priority order):
   1. Ollama local server  (OLLAMA_HOST env var, default http://localhost:11434)
@@ -26,91 +28,185 @@ log = logging.getLogger(__name__)
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 HF_API_TOKEN = os.getenv("HF_API_TOKEN", "")
 LLM_BACKEND = os.getenv("LLM_BACKEND", "auto").lower()  # auto | ollama | hf | none
-LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "30"))
+LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "30"))  # per call: connect / write / pool, default read
+LLM_REASON_TIMEOUT = int(os.getenv("LLM_REASON_TIMEOUT", "30"))  # read budget per reason in a batch
 
 HF_MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "10m")  # keep model loaded between requests
+
+REASON_MAX_TOKENS = 60         # generation budget per reason
 
 
 # ── Prompt builder ─────────────────────────────────────────────────────────────
+# The USER CONTEXT block depends only on the user, so callers build it once
+# per request (build_user_context) and reuse it for every batch.
 
-def _build_prompt(
+def build_user_context(
     user_profile: UserProfileInfo,
     user_objective: UserObjective,
-    candidate: NetworkProfile,
-    kg_signals: List[str],
-    kg_score: float,
-    chroma_score: float,
 ) -> str:
     user_skills = ", ".join(sk.skill for sk in (user_profile.top_skills or []))
     target_titles = ", ".join(
         t for tp in user_objective.target_profiles for t in tp.titles
     )
-    signals_text = "; ".join(kg_signals) if kg_signals else "none"
-
-    return f"""<s>[INST]
-You are an AI recruitment assistant. Given the context below, write a single concise sentence
-(max 25 words) explaining why this candidate is a good match for the user's objective.
-Be specific. Do not repeat the candidate's name in the reason.
-
-USER CONTEXT
+    return f"""USER CONTEXT
   Goal: {user_objective.primary_goal}
   Seeking: {target_titles}
   User skills: {user_skills}
-  Success signals: {', '.join(user_objective.success_signals or [])}
+  Success signals: {', '.join(user_objective.success_signals or [])}"""
+
 
-CANDIDATE
+def _build_candidate_block(header: str, candidate: NetworkProfile) -> str:
+    return f"""{header}
   Title: {candidate.title}
   Company: {candidate.company or 'N/A'}
   Industry: {candidate.industry or 'N/A'}
   Skills: {', '.join(candidate.skills or [])}
-  Summary: {candidate.summary or 'N/A'}
+  Summary: {candidate.summary or 'N/A'}"""
+
+
+def _build_signal_lines(
+    kg_signals: List[str], kg_score: float, chroma_score: float, indent: str = ""
+) -> str:
+    signals_text = "; ".join(kg_signals) if kg_signals else "none"
+    return (
+        f"{indent}MATCH SIGNALS (from knowledge graph): {signals_text}\n"
+        f"{indent}KG Score: {kg_score:.1f}/100   Semantic Score: {chroma_score:.1f}/100"
+    )
+
+
+def _build_batch_prompt(
+    user_context: str,
+    candidates: List[NetworkProfile],
+    signals_list: List[List[str]],
+    kg_scores: List[float],
+    chroma_scores: List[float],
+) -> str:
+    candidates_text = "\n\n".join(
+        _build_candidate_block(f"CANDIDATE {i}", c)
+        + "\n"
+        + _build_signal_lines(signals, kg_score, chroma_score, indent="  ")
+        for i, (c, signals, kg_score, chroma_score) in enumerate(
+            zip(candidates, signals_list, kg_scores, chroma_scores), start=1
+        )
+    )
+    example = ", ".join(f'"{i}": "..."' for i in range(1, len(candidates) + 1))
+
+    return f"""<s>[INST]
+You are an AI recruitment assistant. Given the context below, write one concise sentence
+(max 25 words) per candidate explaining why that candidate is a good match for the user's objective.
+Be specific. Do not repeat the candidate's name in the reason.
+
+{user_context}
 
-MATCH SIGNALS (from knowledge graph): {signals_text}
-KG Score: {kg_score:.1f}/100   Semantic Score: {chroma_score:.1f}/100
+{candidates_text}
 
-Respond with ONLY the reason sentence, nothing else.
+Respond with ONLY a JSON object mapping each candidate number to its reason sentence:
+{{{example}}}
 [/INST]"""
 
 
+def _parse_batch_reasons(text: Optional[str], n: int) -> List[Optional[str]]:
+    """Extract reasons 1..n from the model's JSON reply; None where missing."""
+    if not text:
+        return [None] * n
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        data = json.loads(text[start:end + 1]) if start != -1 else {}
+    except json.JSONDecodeError:
+        log.warning("Could not parse batched LLM reply as JSON.")
+        return [None] * n
+    if not isinstance(data, dict):
+        return [None] * n
+    reasons: List[Optional[str]] = []
+    for i in range(1, n + 1):
+        reason = data.get(str(i))
+        reasons.append(reason.strip() if isinstance(reason, str) and reason.strip() else None)
+    return reasons
+
+
+# ── Shared HTTP client ─────────────────────────────────────────────────────────
+# One pooled client for all backend calls (keep-alive connections, HTTP/2),
+# created lazily on first use and closed from the FastAPI lifespan.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=LLM_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=32),
+        )
+    return _client
+
+
+def _request_timeout(read: float) -> httpx.Timeout:
+    """Only the read (generation) wait grows; connect / write / pool stay LLM_TIMEOUT."""
+    return httpx.Timeout(LLM_TIMEOUT, read=read)
+
+
+async def aclose_client() -> None:
+    """Close the shared HTTP client (called on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
 # ── Backend implementations ────────────────────────────────────────────────────
 
-async def _call_ollama(prompt: str) -> Optional[str]:
+async def _call_ollama(
+    prompt: str,
+    max_tokens: int = REASON_MAX_TOKENS,
+    json_mode: bool = False,
+    read_timeout: float = LLM_TIMEOUT,
+) -> Optional[str]:
     payload = {
         "model": OLLAMA_MODEL,
         "prompt": prompt,
         "stream": False,
-        "options": {"temperature": 0.3, "num_predict": 60},
+        "options": {"temperature": 0.3, "num_predict": max_tokens},
+        "keep_alive": OLLAMA_KEEP_ALIVE,
     }
+    if json_mode:
+        payload["format"] = "json"
     try:
-        async with httpx.AsyncClient(timeout=LLM_TIMEOUT) as client:
-            r = await client.post(f"{OLLAMA_HOST}/api/generate", json=payload)
-            r.raise_for_status()
-            return r.json().get("response", "").strip()
+        r = await _get_client().post(
+            f"{OLLAMA_HOST}/api/generate",
+            json=payload,
+            timeout=_request_timeout(read_timeout),
+        )
+        r.raise_for_status()
+        return r.json().get("response", "").strip()
     except Exception as e:
         log.warning(f"Ollama call failed: {e}")
         return None
 
 
-async def _call_hf(prompt: str) -> Optional[str]:
+async def _call_hf(
+    prompt: str, max_tokens: int = REASON_MAX_TOKENS, read_timeout: float = LLM_TIMEOUT
+) -> Optional[str]:
     if not HF_API_TOKEN:
         return None
     headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
     payload = {
         "inputs": prompt,
-        "parameters": {"max_new_tokens": 60, "temperature": 0.3, "return_full_text": False},
+        "parameters": {"max_new_tokens": max_tokens, "temperature": 0.3, "return_full_text": False},
     }
     try:
-        async with httpx.AsyncClient(timeout=LLM_TIMEOUT) as client:
-            r = await client.post(
-                f"https://api-inference.huggingface.co/models/{HF_MODEL}",
-                headers=headers,
-                json=payload,
-            )
-            r.raise_for_status()
-            data = r.json()
-            if isinstance(data, list) and data:
-                return data[0].get("generated_text", "").strip()
+        r = await _get_client().post(
+            f"https://api-inference.huggingface.co/models/{HF_MODEL}",
+            headers=headers,
+            json=payload,
+            timeout=_request_timeout(read_timeout),
+        )
+        r.raise_for_status()
+        data = r.json()
+        if isinstance(data, list) and data:
+            return data[0].get("generated_text", "").strip()
     except Exception as e:
         log.warning(f"HuggingFace call failed: {e}")
     return None
@@ -128,41 +224,61 @@ def _fallback_reason(
         return f"Strong match based on {top.lower()} with a combined alignment score of {((kg_score + chroma_score) / 2):.0f}/100."
     return (
         f"Candidate aligns semantically with the target profile "
+        f"(semantic similarity score {chroma_score:.0f}/100)."
     )
 
 
 # ── Public interface ───────────────────────────────────────────────────────────
 
-async def generate_reason(
+async def generate_reasons_batch(
     user_profile: UserProfileInfo,
     user_objective: UserObjective,
-    candidate: NetworkProfile,
-    kg_signals: List[str],
-    kg_score: float,
-    chroma_score: float,
-) -> str:
+    candidates: List[NetworkProfile],
+    signals_list: List[List[str]],
+    kg_scores: List[float],
+    chroma_scores: List[float],
+    user_context: Optional[str] = None,
+    read_timeout: Optional[float] = None,
+) -> List[str]:
     """
-    Generate a match reason using the configured backend.
-    Always returns a string (falls back to deterministic if LLM unavailable).
+    Generate match reasons for several candidates with a single LLM call.
+    Returns one string per candidate, in order; any reason the model omits
+    or that cannot be parsed falls back to the deterministic summary.
+    Pass `user_context` (from build_user_context) to reuse it across batches.
+    `read_timeout` defaults to LLM_REASON_TIMEOUT per candidate, since the
+    generation budget grows with the batch; callers that queue several
+    batches on a sequential backend should pass a larger one.
     """
+    n = len(candidates)
+    if n == 0:
+        return []
     backend = LLM_BACKEND
+    max_tokens = REASON_MAX_TOKENS * n + 16 * n   # reasons + JSON framing
+    if read_timeout is None:
+        read_timeout = LLM_REASON_TIMEOUT * n
+    reasons: List[Optional[str]] = [None] * n
+
+    if backend in ("auto", "ollama", "hf"):
+        if user_context is None:
+            user_context = build_user_context(user_profile, user_objective)
+        prompt = _build_batch_prompt(
+            user_context, candidates, signals_list, kg_scores, chroma_scores
+        )
 
-    # Check Ollama availability once on first call (simple heuristic)
     if backend in ("auto", "ollama"):
-        result = await _call_ollama(
-            _build_prompt(user_profile, user_objective, candidate, kg_signals, kg_score, chroma_score)
+        reasons = _parse_batch_reasons(
+            await _call_ollama(prompt, max_tokens=max_tokens, json_mode=True, read_timeout=read_timeout), n
         )
-        if result:
-            return result
-        if backend == "ollama":
-            log.warning("Ollama backend selected but unavailable; using fallback.")
-            return _fallback_reason(candidate, kg_signals, kg_score, chroma_score)
-
-    if backend in ("auto", "hf"):
-        result = await _call_hf(
-            _build_prompt(user_profile, user_objective, candidate, kg_signals, kg_score, chroma_score)
+        if backend == "ollama" and not all(reasons):
+            log.warning("Ollama batch incomplete or unavailable; using fallback for gaps.")
+
+    if backend in ("auto", "hf") and not all(reasons):
+        hf_reasons = _parse_batch_reasons(
+            await _call_hf(prompt, max_tokens=max_tokens, read_timeout=read_timeout), n
         )
-        if result:
-            return result
+        reasons = [r or h for r, h in zip(reasons, hf_reasons)]
 
-    return _fallback_reason(candidate, kg_signals, kg_score, chroma_score)
+    return [
+        r or _fallback_reason(c, sig, kg, ch)
+        for r, c, sig, kg, ch in zip(reasons, candidates, signals_list, kg_scores, chroma_scores)
+    ]
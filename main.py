@@ -15,9 +15,11 @@ import time
 from contextlib import asynccontextmanager
 from typing import List
 
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Request, Response, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
 
 from schemas import MatchRequest, MatchResult
 from matcher import run_matching
@@ -43,9 +45,18 @@ async def lifespan(app: FastAPI):
         log.info("Embedding model ready.")
     except Exception as e:
         log.warning(f"Embedding model warm-up failed: {e}")
+    log.info("Compiling knowledge-graph label matcher …")
+    try:
+        from kg_match_numba import warm_up
+        warm_up()
+        log.info("Label matcher ready.")
+    except Exception as e:
+        log.warning(f"Label matcher warm-up failed: {e}")
     _ready = True
     yield
     log.info("Shutting down.")
+    from llm_reasoner import aclose_client
+    await aclose_client()
 
 
 # ── App ────────────────────────────────────────────────────────────────────────
@@ -53,8 +64,8 @@ app = FastAPI(
     title="Matchmaker API",
     description=(
         "Three-stage candidate matching pipeline:\n"
-        "1. **Knowledge Graph** (NetworkX) — typed structural scoring\n"
-        "2. **ChromaDB** — semantic vector retrieval\n"
+        "1. **Knowledge Graph** — typed structural scoring\n"
+        "2. **MiniLM embeddings** — semantic vector retrieval\n"
         "3. **Mistral-7B** — natural-language reasoning\n"
     ),
     version="1.0.0",
@@ -79,6 +90,31 @@ async def add_process_time_header(request: Request, call_next):
     return response
 
 
+# ── OpenAPI: document the raw-body /match request schema ──────────────────────
+# /match validates its body with MatchRequest.model_validate_json (pydantic-core
+# parses JSON straight into models, no intermediate dict), so FastAPI does not
+# see a typed body parameter; register the schema by hand for /docs.
+_MATCH_REQUEST_SCHEMA = MatchRequest.model_json_schema(
+    ref_template="#/components/schemas/{model}"
+)
+_MATCH_REQUEST_DEFS = _MATCH_REQUEST_SCHEMA.pop("$defs", {})
+_default_openapi = app.openapi
+
+
+def _openapi():
+    if app.openapi_schema is None:
+        schema = _default_openapi()
+        components = schema.setdefault("components", {}).setdefault("schemas", {})
+        components.update(_MATCH_REQUEST_DEFS)
+        components["MatchRequest"] = _MATCH_REQUEST_SCHEMA
+    return app.openapi_schema
+
+
+app.openapi = _openapi
+
+_match_results_adapter = TypeAdapter(List[MatchResult])
+
+
 # ── Routes ─────────────────────────────────────────────────────────────────────
 
 @app.get("/health", tags=["ops"], summary="Liveness probe")
@@ -103,19 +139,39 @@ async def ready():
         422: {"description": "Validation error — check request schema"},
         500: {"description": "Internal server error"},
     },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"$ref": "#/components/schemas/MatchRequest"}}
+            },
+        }
+    },
 )
-async def match_candidates(request: MatchRequest):
+async def match_candidates(raw_request: Request):
     """
     Submit a user profile + objective + network of candidates.
     Returns candidates ranked by a blended Knowledge-Graph + Semantic score,
     with an LLM-generated natural-language reason for each match.
     """
+    try:
+        request = MatchRequest.model_validate_json(await raw_request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
+
     if not request.network_profiles:
-        return []
+        return Response(content=b"[]", media_type="application/json")
 
     try:
         results = await run_matching(request)
-        return results
+        # Results are already validated MatchResult models: serialise directly
+        # instead of letting FastAPI re-validate them against response_model
+        return Response(
+            content=_match_results_adapter.dump_json(results),
+            media_type="application/json",
+        )
     except Exception as e:
         log.exception("Matching pipeline error")
         raise HTTPException(
@@ -4,27 +4,94 @@ matcher.py
 Orchestrates the three-stage pipeline:
 
   Stage 1 – Knowledge Graph  → structural scores + typed signals
-  Stage 2 – ChromaDB         → semantic similarity scores + retrieval rank
+  Stage 2 – Embeddings       → semantic similarity scores + retrieval rank
   Stage 3 – Mistral 7B       → natural-language reasoning per candidate
 
-Final score = weighted blend of KG score and ChromaDB score.
+Final score = weighted blend of KG score and semantic similarity score.
   final = (KG_WEIGHT × kg_score) + (CHROMA_WEIGHT × chroma_score)
+
+Stage 3 only calls the LLM for the top LLM_TOP_K candidates whose KG evidence
+is not already strong; everyone else gets the deterministic reason (unless
+the request sets force_llm).
 """
 
 import asyncio
 import logging
-from typing import List
+import os
+import re
+from typing import FrozenSet, List
+
+import numpy as np
 
-from schemas import MatchRequest, MatchResult
+from schemas import MatchRequest, MatchResult, NetworkProfile, UserObjective, UserProfileInfo
 from knowledge_graph import kg_filter_and_score
-from vector_store import get_retrieval_scores
-from llm_reasoner import generate_reason
+from vector_store import encode_query, get_retrieval_scores
+from llm_reasoner import LLM_REASON_TIMEOUT, _fallback_reason, build_user_context, generate_reasons_batch
 
 log = logging.getLogger(__name__)
 
 KG_WEIGHT = float(0.45)        # Knowledge graph contributes 45%
 CHROMA_WEIGHT = float(0.55)    # Semantic retrieval contributes 55%
 MIN_SCORE_THRESHOLD = 0.0      # Set > 0 to filter out weak matches
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "8"))  # candidates per LLM prompt
+LLM_TOP_K = int(os.getenv("LLM_TOP_K", "10"))  # only the top-K by score get LLM reasons
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))  # max in-flight LLM calls per request
+STRONG_KG_SCORE = 60.0         # KG score at/above which …
+STRONG_KG_MIN_SIGNALS = 2      # … with this many signals, the deterministic reason suffices
+PREFILTER_MIN_OVERLAP = int(os.getenv("PREFILTER_MIN_OVERLAP", "1"))  # 0 disables the pre-filter
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+_STOPWORDS = frozenset({"a", "an", "and", "at", "for", "in", "of", "on", "or", "the", "to", "with"})
+
+
+def _tokens(*texts: str) -> FrozenSet[str]:
+    return frozenset(
+        tok for text in texts for tok in _TOKEN_RE.findall(text.lower())
+        if tok not in _STOPWORDS
+    )
+
+
+def _prefilter_candidates(
+    user_profile: UserProfileInfo,
+    user_objective: UserObjective,
+    candidates: List[NetworkProfile],
+    min_overlap: int,
+) -> List[NetworkProfile]:
+    """
+    Keep candidates sharing at least `min_overlap` tokens with the user's
+    skills / sought titles. Set membership is O(1) per token, so this is far
+    cheaper than embedding. Returns all candidates if none pass.
+    """
+    user_tokens = _tokens(
+        *(sk.skill for sk in user_profile.top_skills or []),
+        *(t for tp in user_objective.target_profiles for t in tp.titles),
+    )
+    kept = [
+        c for c in candidates
+        if len(user_tokens & _tokens(c.title, c.industry or "", c.summary or "", *(c.skills or [])))
+        >= min_overlap
+    ]
+    return kept or candidates
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first, ties in input order
+    (same result as a stable descending sort truncated to k).
+    O(N) partition to find the k-th score, then only the k winners are sorted.
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - above.size]
+        idx = np.concatenate((above, ties))
+    else:
+        idx = np.arange(n)
+    return idx[np.lexsort((idx, -scores[idx]))]
 
 
 async def run_matching(request: MatchRequest) -> List[MatchResult]:
@@ -35,47 +102,121 @@ async def run_matching(request: MatchRequest) -> List[MatchResult]:
     if not candidates:
         return []
 
-    # ── Stage 1: Knowledge Graph ───────────────────────────────────────────────
-    log.info("Stage 1: Running knowledge graph scoring …")
-    kg_results = kg_filter_and_score(user_profile, user_objective, candidates)
-    # {profile_id: (kg_score, [signals])}
+    # Cheap token-overlap pre-filter: only plausible candidates are embedded;
+    # the rest keep their KG score with a semantic score of 0
+    if request.force_full or PREFILTER_MIN_OVERLAP <= 0:
+        semantic_candidates = candidates
+    else:
+        semantic_candidates = _prefilter_candidates(
+            user_profile, user_objective, candidates, PREFILTER_MIN_OVERLAP
+        )
+        log.info(f"Pre-filter: {len(semantic_candidates)}/{len(candidates)} candidates sent to Stage 2.")
+
+    # ── Stages 1 + 2: Knowledge Graph ∥ semantic retrieval ─────────────────────
+    # Independent and CPU-bound: run both in worker threads so wall time is
+    # max(kg, retrieval) and the event loop stays free for other requests.
+    log.info("Stages 1+2: Running knowledge graph scoring and semantic retrieval …")
+
+    async def semantic_stage():
+        # User query embedded once per request (LRU-cached across requests)
+        query_embedding = await asyncio.to_thread(encode_query, user_profile, user_objective)
+        return await asyncio.to_thread(
+            get_retrieval_scores,
+            user_profile,
+            user_objective,
+            semantic_candidates,
+            query_embedding=query_embedding,
+        )
 
-    # ── Stage 2: ChromaDB semantic retrieval ───────────────────────────────────
-    log.info("Stage 2: Running ChromaDB semantic retrieval …")
-    chroma_results = get_retrieval_scores(user_profile, user_objective, candidates)
-    # {profile_id: (chroma_score_0_to_100, rank)}
+    kg_results, chroma_results = await asyncio.gather(
+        asyncio.to_thread(kg_filter_and_score, user_profile, user_objective, candidates),
+        semantic_stage(),
+    )
+    # kg_results:     {profile_id: (kg_score, [signals])}
+    # chroma_results: {profile_id: (chroma_score_0_to_100, rank)}
 
-    # ── Stage 3: LLM reasoning (parallelised) ─────────────────────────────────
+    # ── Stage 3: LLM reasoning (batched prompts, bounded concurrency) ─────────
     log.info("Stage 3: Generating LLM reasons …")
 
-    async def process_candidate(c) -> MatchResult:
-        pid = c.profile_id
-        kg_score, signals = kg_results.get(pid, (0.0, []))
-        chroma_score, rank = chroma_results.get(pid, (0.0, None))
-
-        final_score = round(
-            KG_WEIGHT * kg_score + CHROMA_WEIGHT * chroma_score, 2
+    kg_scores, signals_list, chroma_scores, ranks, final_scores = [], [], [], [], []
+    for c in candidates:
+        kg_score, signals = kg_results.get(c.profile_id, (0.0, []))
+        chroma_score, rank = chroma_results.get(c.profile_id, (0.0, None))
+        kg_scores.append(kg_score)
+        signals_list.append(signals)
+        chroma_scores.append(chroma_score)
+        ranks.append(rank)
+        final_scores.append(round(KG_WEIGHT * kg_score + CHROMA_WEIGHT * chroma_score, 2))
+
+    # Decide who needs the LLM: top-K by final score, minus strong KG matches
+    if request.force_llm:
+        llm_idx = list(range(len(candidates)))
+    else:
+        top = _top_k_indices(np.asarray(final_scores, dtype=np.float64), LLM_TOP_K)
+        llm_idx = sorted(
+            int(i) for i in top
+            if not (
+                kg_scores[i] >= STRONG_KG_SCORE
+                and len(signals_list[i]) >= STRONG_KG_MIN_SIGNALS
+            )
         )
+    log.info(f"Stage 3: {len(llm_idx)}/{len(candidates)} candidates routed to the LLM.")
 
-        reason = await generate_reason(
-            user_profile, user_objective, c, signals, kg_score, chroma_score
+    reasons = [
+        _fallback_reason(c, signals, kg_score, chroma_score)
+        for c, signals, kg_score, chroma_score in zip(
+            candidates, signals_list, kg_scores, chroma_scores
         )
-
-        return MatchResult(
-            profile_id=pid,
+    ]
+    user_context = build_user_context(user_profile, user_objective)  # once per request
+    batch_size = max(1, LLM_BATCH_SIZE)
+    chunks = [llm_idx[i:i + batch_size] for i in range(0, len(llm_idx), batch_size)]
+    # Ollama serves one model instance sequentially, so unbounded fan-out only
+    # queues at the socket; the semaphore also keeps at most LLM_CONCURRENCY
+    # prompts alive at once (each is built inside generate_reasons_batch).
+    sem = asyncio.Semaphore(max(1, LLM_CONCURRENCY))
+    # In-flight calls queue behind each other on a sequential backend, so each
+    # gets the read budget of every batch that can be in flight with it
+    in_flight = min(max(1, LLM_CONCURRENCY), len(chunks))
+    read_timeout = LLM_REASON_TIMEOUT * batch_size * in_flight
+
+    async def reason_batch(chunk: List[int]) -> List[str]:
+        async with sem:
+            return await generate_reasons_batch(
+                user_profile,
+                user_objective,
+                [candidates[i] for i in chunk],
+                [signals_list[i] for i in chunk],
+                [kg_scores[i] for i in chunk],
+                [chroma_scores[i] for i in chunk],
+                user_context=user_context,
+                read_timeout=read_timeout,
+            )
+
+    batches = await asyncio.gather(*(reason_batch(chunk) for chunk in chunks))
+    for chunk, batch_reasons in zip(chunks, batches):
+        for i, reason in zip(chunk, batch_reasons):
+            reasons[i] = reason
+
+    results: List[MatchResult] = [
+        MatchResult(
+            profile_id=c.profile_id,
             name=c.name,
-            score=final_score,
+            score=score,
             reason=reason,
             kg_signals=signals,
             retrieval_rank=rank,
         )
+        for c, score, signals, rank, reason in zip(
+            candidates, final_scores, signals_list, ranks, reasons
+        )
+    ]
 
-    tasks = [process_candidate(c) for c in candidates]
-    results: List[MatchResult] = await asyncio.gather(*tasks)
-
-    # Sort by score descending, filter by threshold
+    # Filter by threshold, then rank by score descending (top_k only if requested)
     results = [r for r in results if r.score >= MIN_SCORE_THRESHOLD]
-    results.sort(key=lambda r: r.score, reverse=True)
+    scores = np.fromiter((r.score for r in results), dtype=np.float64, count=len(results))
+    k = request.top_k if request.top_k is not None else len(results)
+    results = [results[i] for i in _top_k_indices(scores, k)]
 
     log.info(f"Matching complete. {len(results)} candidates scored.")
     return results
@@ -0,0 +1,34 @@
+"""
+quantize_embeddings.py
+──────────────────────
+Exports all-MiniLM-L6-v2 to ONNX and applies dynamic int8 quantisation
+(AVX512-VNNI config), so vector_store.py can serve embeddings through
+onnxruntime instead of the FP32 PyTorch model.
+
+Run once at image build time:
+  python quantize_embeddings.py [save_dir]     (default: $EMBED_ONNX_DIR)
+"""
+
+import os
+import sys
+
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+HF_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def export_quantized(save_dir: str) -> None:
+    model = ORTModelForFeatureExtraction.from_pretrained(HF_MODEL_ID, export=True)
+    quantizer = ORTQuantizer.from_pretrained(model)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=save_dir, quantization_config=qconfig)
+    # vector_store loads the tokenizer from the same directory
+    AutoTokenizer.from_pretrained(HF_MODEL_ID).save_pretrained(save_dir)
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.getenv("EMBED_ONNX_DIR", "models/minilm-int8")
+    export_quantized(target)
+    print(f"Quantised model written to {target}")
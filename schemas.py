@@ -52,6 +52,9 @@ class MatchRequest(BaseModel):
     user_profile: UserProfileInfo
     user_objective: UserObjective
     network_profiles: List[NetworkProfile]
+    force_llm: bool = Field(default=False, description="Generate LLM reasons for every candidate, not just the top-K")
+    force_full: bool = Field(default=False, description="Skip the token-overlap pre-filter and embed every candidate")
+    top_k: Optional[int] = Field(default=None, ge=1, description="Return only the K best matches (default: all)")
 
 
 # ── Output Schemas ─────────────────────────────────────────────────────────────
@@ -62,4 +65,4 @@ class MatchResult(BaseModel):
     score: float
     reason: str
     kg_signals: Optional[List[str]] = Field(default=[], description="Knowledge graph matched signals")
-    retrieval_rank: Optional[int] = Field(default=None, description="ChromaDB retrieval rank")
+    retrieval_rank: Optional[int] = Field(default=None, description="Semantic retrieval rank")
@@ -1,32 +1,119 @@
 """
 vector_store.py
 ───────────────
-Uses ChromaDB (in-memory, ephemeral per request) to embed candidate profiles
-and retrieve the most semantically similar ones to the user's objective.
+Embeds candidate profiles and the user's objective and ranks candidates by
+cosine similarity (NumPy dot product over L2-normalised vectors — no vector
+DB index is built per request). The query is encoded on its own, once per
+request (encode_query, LRU-cached on the query text); only candidates missing
+from the embedding index go through the encoder, in length-sorted batches.
 
 Embedding model: sentence-transformers/all-MiniLM-L6-v2 (local, no API key).
-Each request creates a fresh ephemeral collection so the service stays stateless.
+If an int8-quantised ONNX export is present (see quantize_embeddings.py) and
+onnxruntime is installed, it is used instead of the FP32 PyTorch model.
+
+Candidate embeddings live in an in-process NumPy index (LRU, keyed on a hash
+of the profile's canonical JSON) so profiles seen in earlier requests skip
+the transformer. Scores are always recomputed against the current query, and
+nothing is persisted to disk, so results stay stateless.
 """
 
-import uuid
-from typing import Dict, List, Tuple
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
-import chromadb
+import numpy as np
 
 from schemas import UserProfileInfo, UserObjective, NetworkProfile
 
-# ── Singleton embedding function (loaded once at startup) ──────────────────────
-from sentence_transformers import SentenceTransformer
-from chromadb import EmbeddingFunction, Documents, Embeddings
+try:
+    import onnxruntime as ort
+except ImportError:  # optional — falls back to sentence-transformers
+    ort = None
 
+# ── Singleton embedding model (loaded once at startup) ─────────────────────────
 _EMBED_MODEL = "all-MiniLM-L6-v2"
-_st_model = SentenceTransformer(_EMBED_MODEL)
+_ENCODE_BATCH_SIZE = 64
+_MAX_SEQ_LENGTH = 256          # matches all-MiniLM-L6-v2's max_seq_length
+_ONNX_MODEL_DIR = os.getenv("EMBED_ONNX_DIR", "models/minilm-int8")
+_ONNX_MODEL_FILE = os.path.join(_ONNX_MODEL_DIR, "model_quantized.onnx")
+# Half the usable cores by default: the Numba KG kernel (KG_THREADS) runs
+# concurrently. Affinity reflects cpusets, not CFS quotas (k8s cpu limits),
+# so deployments with a CPU limit should set TORCH_THREADS explicitly.
+_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+_EMBED_THREADS = int(os.getenv("TORCH_THREADS", max(1, _CPUS // 2)))
+_EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "100000"))
+
+_ort_session = None
+_st_model = None
+
+if ort is not None and os.path.exists(_ONNX_MODEL_FILE):
+    from transformers import AutoTokenizer
+
+    _tokenizer = AutoTokenizer.from_pretrained(_ONNX_MODEL_DIR)
+    _ort_options = ort.SessionOptions()
+    _ort_options.intra_op_num_threads = _EMBED_THREADS
+    _ort_session = ort.InferenceSession(
+        _ONNX_MODEL_FILE, sess_options=_ort_options, providers=["CPUExecutionProvider"]
+    )
+    _ort_inputs = {i.name for i in _ort_session.get_inputs()}
+else:
+    import torch
+    from sentence_transformers import SentenceTransformer
 
-class STEmbeddingFunction(EmbeddingFunction):
-    def __call__(self, input: Documents) -> Embeddings:
-        return _st_model.encode(list(input)).tolist()
+    # Fixed intra-op pool, eval mode, no autograd bookkeeping
+    torch.set_num_threads(_EMBED_THREADS)
+    torch.set_grad_enabled(False)
+    _st_model = SentenceTransformer(_EMBED_MODEL)
+    _st_model.eval()
 
-_embed_fn = STEmbeddingFunction()
+
+def _onnx_encode(texts: List[str], batch_size: int) -> np.ndarray:
+    """
+    Tokenise once → length-sorted batches (minimal padding) → int8 ONNX
+    forward → mean-pool → L2-normalise, returned in the original order.
+    """
+    enc = _tokenizer(list(texts), truncation=True, max_length=_MAX_SEQ_LENGTH)
+    input_ids = enc["input_ids"]
+    order = np.argsort([len(ids) for ids in input_ids], kind="stable")
+    pad_id = _tokenizer.pad_token_id or 0
+    chunks = []
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        seq_len = len(input_ids[batch[-1]])  # sorted, so the last is longest
+        ids = np.full((len(batch), seq_len), pad_id, dtype=np.int64)
+        mask = np.zeros((len(batch), seq_len), dtype=np.int64)
+        for row, i in enumerate(batch):
+            ids[row, :len(input_ids[i])] = input_ids[i]
+            mask[row, :len(input_ids[i])] = 1
+        feeds = {"input_ids": ids, "attention_mask": mask, "token_type_ids": np.zeros_like(ids)}
+        token_emb = _ort_session.run(
+            None, {k: v for k, v in feeds.items() if k in _ort_inputs}
+        )[0]  # (batch, seq, dim)
+        m = mask[..., None].astype(np.float32)
+        chunks.append((token_emb * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None))
+    emb = np.concatenate(chunks).astype(np.float32)[np.argsort(order)]
+    return emb / np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+
+
+def _embed_fn(texts: List[str]) -> np.ndarray:
+    """
+    Encode texts into L2-normalised float32 vectors, shape (len(texts), dim).
+    Both backends length-sort inputs into batches (sentence-transformers does
+    so inside encode), so similarly sized texts share minimal padding.
+    """
+    if _ort_session is not None:
+        return _onnx_encode(list(texts), _ENCODE_BATCH_SIZE)
+    # Grad mode is thread-local; encode may run off the main thread
+    with torch.inference_mode():
+        return _st_model.encode(
+            list(texts),
+            batch_size=_ENCODE_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
 
 
 def _build_candidate_document(c: NetworkProfile) -> str:
@@ -46,6 +133,90 @@ def _build_candidate_document(c: NetworkProfile) -> str:
     return ". ".join(parts)
 
 
+# ── Candidate embedding index ──────────────────────────────────────────────────
+# One float16 matrix (grown by doubling up to EMBED_CACHE_SIZE rows) plus an
+# LRU map {profile content hash: row}. When full, the least recently used
+# row is overwritten. float16 halves memory; the rounding is negligible for
+# cosine ranking. Keys hash the profile content, so edited profiles miss.
+_index = np.empty((0, 0), dtype=np.float16)
+_index_rows: "OrderedDict[bytes, int]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def _profile_key(c: NetworkProfile) -> bytes:
+    return hashlib.blake2b(c.model_dump_json().encode("utf-8"), digest_size=16).digest()
+
+
+def _index_insert(key: bytes, vec: np.ndarray) -> None:
+    """Store one vector under key, evicting the LRU row if full. Hold _index_lock."""
+    global _index
+    if _EMBED_CACHE_SIZE <= 0:
+        return
+    row = _index_rows.get(key)
+    if row is not None:
+        _index_rows.move_to_end(key)
+    elif len(_index_rows) >= _EMBED_CACHE_SIZE:
+        _, row = _index_rows.popitem(last=False)
+        _index_rows[key] = row
+    else:
+        row = len(_index_rows)
+        if row >= _index.shape[0]:
+            capacity = min(_EMBED_CACHE_SIZE, max(1024, 2 * _index.shape[0]))
+            grown = np.empty((capacity, vec.shape[0]), dtype=np.float16)
+            if _index.shape[0]:
+                grown[:_index.shape[0]] = _index
+            _index = grown
+        _index_rows[key] = row
+    _index[row] = vec
+
+
+def _candidate_embeddings(candidates: List[NetworkProfile]) -> np.ndarray:
+    """
+    Return float32 embeddings, shape (len(candidates), dim), gathering cached
+    rows from the index and encoding only the misses.
+    """
+    keys = [_profile_key(c) for c in candidates]
+    hit_pos: List[int] = []
+    hit_rows: List[int] = []
+    with _index_lock:
+        for i, key in enumerate(keys):
+            row = _index_rows.get(key)
+            if row is not None:
+                _index_rows.move_to_end(key)
+                hit_pos.append(i)
+                hit_rows.append(row)
+        hits = _index[hit_rows]  # fancy indexing copies before any eviction
+
+    hit_set = set(hit_pos)
+    missing: Dict[bytes, int] = {}           # key → row in `fresh`
+    miss_pos: List[int] = []
+    miss_src: List[int] = []
+    miss_docs: List[str] = []
+    for i, (key, c) in enumerate(zip(keys, candidates)):
+        if i in hit_set:
+            continue
+        if key not in missing:
+            missing[key] = len(miss_docs)
+            miss_docs.append(_build_candidate_document(c))
+        miss_pos.append(i)
+        miss_src.append(missing[key])
+
+    fresh = hits[:0]
+    if miss_docs:
+        fresh = _embed_fn(miss_docs).astype(np.float16)
+        with _index_lock:
+            for key, j in missing.items():
+                _index_insert(key, fresh[j])
+
+    dim = hits.shape[1] if hit_pos else fresh.shape[1]
+    emb = np.empty((len(candidates), dim), dtype=np.float32)
+    if hit_pos:
+        emb[hit_pos] = hits
+    if miss_pos:
+        emb[miss_pos] = fresh[miss_src]
+    return emb
+
+
 def _build_query_document(
     user_profile: UserProfileInfo, user_objective: UserObjective
 ) -> str:
@@ -65,53 +236,56 @@ def _build_query_document(
     return ". ".join(parts)
 
 
+@lru_cache(maxsize=1024)
+def _encode_query_text(query_text: str) -> np.ndarray:
+    emb = _embed_fn([query_text])[0]
+    emb.flags.writeable = False  # shared between requests via the cache
+    return emb
+
+
+def encode_query(
+    user_profile: UserProfileInfo, user_objective: UserObjective
+) -> np.ndarray:
+    """
+    Embed the user's intent once per request (LRU-cached on the query text,
+    so repeat / concurrent requests for the same user skip the encoder).
+    """
+    return _encode_query_text(_build_query_document(user_profile, user_objective))
+
+
 def retrieve_ranked_candidates(
     user_profile: UserProfileInfo,
     user_objective: UserObjective,
     candidates: List[NetworkProfile],
     top_k: int = 5,
+    query_embedding: Optional[np.ndarray] = None,
 ) -> List[Tuple[str, float, int]]:
     """
     Embed all candidates, query with user intent, return ranked list.
+    Pass `query_embedding` (from encode_query) to reuse an existing query vector.
 
     Returns
     -------
     List of (profile_id, cosine_distance, retrieval_rank) sorted by relevance.
-    Distance is ChromaDB's cosine distance (lower = closer).
+    Distance is cosine distance, 1 - cosine_similarity (lower = closer).
     """
     if not candidates:
         return []
 
-    # Ephemeral in-memory client — new UUID collection per request → stateless
-    client = chromadb.EphemeralClient()
-    collection_name = f"matches_{uuid.uuid4().hex[:8]}"
-    collection = client.create_collection(
-        name=collection_name,
-        embedding_function=_embed_fn,
-        metadata={"hnsw:space": "cosine"},
-    )
+    # Query in its own tiny batch; uncached candidates length-bucketed
+    if query_embedding is None:
+        query_embedding = encode_query(user_profile, user_objective)
+    query_emb = query_embedding
+    doc_emb = _candidate_embeddings(candidates)
 
-    # Index all candidates
-    docs = [_build_candidate_document(c) for c in candidates]
-    ids = [c.profile_id for c in candidates]
-    metadatas = [{"name": c.name, "profile_id": c.profile_id} for c in candidates]
-
-    collection.add(documents=docs, ids=ids, metadatas=metadatas)
-
-    # Query
-    query_text = _build_query_document(user_profile, user_objective)
+    # Vectors are normalised, so the dot product is the cosine similarity
+    sims = doc_emb @ query_emb
     n_results = min(top_k, len(candidates))
-    results = collection.query(
-        query_texts=[query_text],
-        n_results=n_results,
-        include=["distances", "metadatas"],
-    )
+    order = np.argsort(-sims, kind="stable")[:n_results]
 
     ranked: List[Tuple[str, float, int]] = []
-    for rank, (pid, dist) in enumerate(
-        zip(results["ids"][0], results["distances"][0]), start=1
-    ):
-        ranked.append((pid, dist, rank))
+    for rank, idx in enumerate(order, start=1):
+        ranked.append((candidates[idx].profile_id, float(1.0 - sims[idx]), rank))
 
     return ranked
 
@@ -120,6 +294,7 @@ def get_retrieval_scores(
     user_profile: UserProfileInfo,
     user_objective: UserObjective,
     candidates: List[NetworkProfile],
+    query_embedding: Optional[np.ndarray] = None,
 ) -> Dict[str, Tuple[float, int]]:
     """
     Convenience wrapper.
@@ -127,7 +302,9 @@ def get_retrieval_scores(
     Returns {profile_id: (similarity_score_0_to_1, rank)}
     where similarity = 1 - cosine_distance.
     """
-    ranked = retrieve_ranked_candidates(user_profile, user_objective, candidates)
+    ranked = retrieve_ranked_candidates(
+        user_profile, user_objective, candidates, query_embedding=query_embedding
+    )
     return {
         pid: (round((1 - dist) * 100, 4), rank)  # convert to 0-100 scale
         for pid, dist, rank in ranked